@@ -1,31 +1,241 @@
+import aiohttp
+import asyncio
+import functools
 import json
+import numpy as np
 import os
 import pandas as pd
-import requests
+import tempfile
+import threading
 import time
 import yaml
 
 from abc import ABC
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests_cache import DO_NOT_CACHE, CachedSession
 from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
+from urllib3.util.retry import Retry
+
+try:
+    import ijson
+except ImportError:  # ijson is optional, responses are then parsed in one go
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json is used instead
+    orjson = None
 
 # Get environment variables
 load_dotenv()
 
+# Dtypes of the known columns of Telraam responses, by key of the response
+CAMERA_DTYPES = {"instance_id": "Int64", "segment_id": "Int64"}
+REPORT_DTYPES = {
+    "instance_id": "Int64",
+    "segment_id": "Int64",
+    "uptime": "float32",
+    **{
+        f"{mode}{side}": "float32"
+        for mode in ["heavy", "car", "bike", "pedestrian"]
+        for side in ["", "_lft", "_rgt"]
+    },
+    "v85": "float32",
+}
+DTYPES = {"camera": CAMERA_DTYPES, "cameras": CAMERA_DTYPES, "report": REPORT_DTYPES}
+
+# Responses larger than this (in bytes) are parsed while they are downloaded
+STREAMING_THRESHOLD = 256 * 1024
+
+# Transient errors retried with exponential backoff, by both the sync and async paths
+RETRY_TOTAL = 5
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+class _Config:
+    """Telraam configuration from environment variables (see .env), each setting read on first use,
+    so a setting given to a fetcher never requires its variable.
+    """
+
+    @functools.cached_property
+    def header(self):
+        """dict: header authenticating requests with the API key (TOKEN)"""
+        return {"X-Api-Key": os.environ["TOKEN"]}
+
+    @functools.cached_property
+    def cameras_url(self):
+        """str: url of the cameras endpoint (CAMERAS_URL)"""
+        return os.environ["CAMERAS_URL"]
+
+    @functools.cached_property
+    def reports_url(self):
+        """str: url of the reports endpoints (REPORTS_URL)"""
+        return os.environ["REPORTS_URL"]
+
+    @functools.cached_property
+    def segments_id(self):
+        """tuple: ids of segments of config file (SEGMENTS_ID)"""
+        return tuple(int(x) for x in os.environ["SEGMENTS_ID"].split(","))
+
+    @functools.cached_property
+    def instances_id(self):
+        """tuple: ids of sensors of config file (INSTANCES_ID)"""
+        return tuple(int(x) for x in os.environ["INSTANCES_ID"].split(","))
+
+    @functools.cached_property
+    def max_workers(self):
+        """int: number of concurrent requests (MAX_WORKERS)"""
+        return int(os.getenv("MAX_WORKERS", "8"))
+
+
+@functools.cache
+def _config():
+    """Get the Telraam configuration of the process, its settings are read once (see .env).
+    Call _config.cache_clear() to read them again, e.g. after editing .env and load_dotenv(override=True).
+
+    Returns:
+        _Config: API key header, cameras and reports urls, ids of segments and sensors,
+            number of concurrent requests
+    """
+    return _Config()
+
+
+def _set_dtypes(data: pd.DataFrame, key: chr):
+    """Cast known columns of a Telraam response to their DTYPES
+
+    Args:
+        data (pd.DataFrame): informations of a Telraam API response
+        key (chr): key of these informations in the response
+
+    Returns:
+        pd.DataFrame: same informations, known columns typed
+    """
+    dtypes = DTYPES.get(key, {})
+    return data.astype(
+        {column: dtype for column, dtype in dtypes.items() if column in data.columns},
+        copy=False,
+    )
 
-def json2pandas(json_text: chr, key: chr):
+
+def json2pandas(json_text: bytes, key: chr):
     """Convert Telraam API response to pandas df
 
     Args:
-        json_text (chr): Telraam API response, JSON format
+        json_text (bytes): Telraam API response, raw JSON bytes (str is also accepted)
+        key (chr): key of informations to put in pd dataframe
+
+    Returns:
+        pd.DataFrame: Value informations for this key in a dataframe, known columns typed with DTYPES
+    """
+    if orjson is not None:
+        dict_json = orjson.loads(json_text)
+    else:
+        dict_json = json.loads(json_text)
+    return _set_dtypes(pd.DataFrame(dict_json[key]), key)
+
+
+def stream2pandas(stream, key: chr):
+    """Convert a large Telraam API response to pandas df, parsing it while it is read
+    Values are gathered column by column, records being dropped once read.
+    Fields missing from a record are None, for the records before their first occurrence too.
+
+    Args:
+        stream (file-like): Telraam API response body, e.g. response.raw of a streamed request
         key (chr): key of informations to put in pd dataframe
 
     Returns:
-        pd.DataFrame: Value informations for this key in a dataframe
+        pd.DataFrame: Value informations for this key in a dataframe, known columns typed with DTYPES
+    """
+    columns = {}
+    for row_count, record in enumerate(
+        ijson.items(stream, f"{key}.item", use_float=True)
+    ):
+        for column in record:
+            if column not in columns:
+                columns[column] = [None] * row_count
+        for column, values in columns.items():
+            values.append(record.get(column))
+    if not columns:
+        return pd.DataFrame()
+    return _set_dtypes(pd.DataFrame(columns), key)
+
+
+class RateLimiter:
+    """Token bucket allowing a number of requests per period, shared between threads."""
+
+    def __init__(self, calls: int, period: float):
+        """Initializes an instance of the RateLimiter class.
+
+        Args:
+            calls (int): number of requests allowed per period
+            period (float): length of the period (in seconds)
+        """
+        self.calls = calls
+        self.period = period
+        self._tokens = calls
+        self._last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token from the bucket, going into debt if it is empty.
+
+        Returns:
+            float: time to wait (in seconds) before sending the request
+        """
+        if self.period <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self._last_update) * self.calls / self.period
+            self._tokens = min(self.calls, self._tokens + refill) - 1
+            self._last_update = now
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.period / self.calls
+
+    def wait(self):
+        """Block until a request can be sent."""
+        time.sleep(self.reserve())
+
+
+@functools.cache
+def _rate_limiter():
+    """Build the rate limiter shared by all fetchers of the process, from environment
+    variables (see .env), the first time it is needed.
+
+    Returns:
+        RateLimiter: RATE_LIMIT_CALLS requests per RATE_LIMIT_PERIOD seconds
+    """
+    return RateLimiter(
+        calls=int(os.getenv("RATE_LIMIT_CALLS", "60")),
+        period=float(os.getenv("RATE_LIMIT_PERIOD", "60")),
+    )
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter taking a token from a RateLimiter before sending each request.
+    Responses served from the cache never reach the adapter and are not limited.
     """
-    dict_json = json.loads(json_text)
-    return pd.DataFrame.from_dict(dict_json[key])
+
+    def __init__(self, rate_limiter: RateLimiter, **kwargs):
+        """Initializes an instance of the RateLimitedAdapter class.
+
+        Args:
+            rate_limiter (RateLimiter): limiter shared by all requests of the process
+            **kwargs: arguments of HTTPAdapter
+        """
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        """Wait for the rate limiter, then send the request (see HTTPAdapter.send)."""
+        self.rate_limiter.wait()
+        return super().send(request, **kwargs)
 
 
 class APIFetcher(ABC):
@@ -33,18 +243,84 @@ class APIFetcher(ABC):
 
     def __init__(
         self,
+        token: chr = None,
+        cameras_url: chr = None,
+        reports_url: chr = None,
+        segments_id: list = None,
+        instances_id: list = None,
+        max_workers: int = None,
     ):
-        """Initializes an instance of the APIFetcher class."""
-        self.header = {"X-Api-Key": os.getenv("TOKEN")}
-        self.cameras_url = os.getenv("CAMERAS_URL")
-        self.reports_url = os.getenv("REPORTS_URL")
-        self.segments_id = list(map(int, os.getenv("SEGMENTS_ID").split(",")))
-        self.instances_id = list(map(int, os.getenv("INSTANCES_ID").split(",")))
+        """Initializes an instance of the APIFetcher class.
+        Arguments left to None are taken from the configuration of the process (see .env).
+
+        Args:
+            token (chr, optional): API key. Defaults to TOKEN.
+            cameras_url (chr, optional): url of the cameras endpoint. Defaults to CAMERAS_URL.
+            reports_url (chr, optional): url of the reports endpoints. Defaults to REPORTS_URL.
+            segments_id (list, optional): ids of segments. Defaults to SEGMENTS_ID.
+            instances_id (list, optional): ids of sensors. Defaults to INSTANCES_ID.
+            max_workers (int, optional): number of concurrent requests. Defaults to MAX_WORKERS.
+        """
+        config = _config()
+        self.header = config.header if token is None else {"X-Api-Key": token}
+        self.cameras_url = config.cameras_url if cameras_url is None else cameras_url
+        self.reports_url = config.reports_url if reports_url is None else reports_url
+        self.segments_id = (
+            config.segments_id if segments_id is None else tuple(segments_id)
+        )
+        self.instances_id = (
+            config.instances_id if instances_id is None else tuple(instances_id)
+        )
+        self.max_workers = config.max_workers if max_workers is None else max_workers
+        # Every fetcher draws from the same bucket, the API limit applies to the API key
+        self.rate_limiter = _rate_limiter()
+
+        # Keep-alive connections reused by every request of this fetcher,
+        # transient errors are retried with exponential backoff.
+        # Responses are cached on disk: cameras for an hour, snapshots for a minute.
+        # The API key is left out of the cache keys and of the stored requests.
+        # Traffic reports are not, past periods are kept in Parquet by TrafficFetcher.
+        self.session = CachedSession(
+            os.path.join("cache", "http_cache"),
+            backend="sqlite",
+            allowable_methods=("GET", "POST"),
+            expire_after=3600,
+            urls_expire_after={
+                f"{self.reports_url}traffic_snapshot": 60,
+                f"{self.reports_url}traffic": DO_NOT_CACHE,
+            },
+            stale_if_error=True,
+            ignored_parameters=["X-Api-Key"],
+        )
+        self.session.headers.update(self.header)
+        adapter = RateLimitedAdapter(
+            self.rate_limiter,
+            pool_connections=16,
+            pool_maxsize=max(32, self.max_workers),
+            max_retries=Retry(
+                total=RETRY_TOTAL,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET", "POST"],
+                respect_retry_after_header=True,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
 
 class SystemFetcher(APIFetcher):
     """Retrieve Telraam info on a system : get active cameras, all segments in world, etc."""
 
+    def __init__(self, **kwargs):
+        """Initializes an instance of the SystemFetcher class.
+
+        Args:
+            **kwargs: configuration overrides of APIFetcher (token, urls, ids, max_workers)
+        """
+        super().__init__(**kwargs)
+        self._cameras_by_segment = {}
+
     def get_all_segments(self, period: str = "past_hour"):
         """Get id's of all active segments for specified time
 
@@ -58,48 +334,64 @@ class SystemFetcher(APIFetcher):
             past_hour = datetime.now() - timedelta(hours=3)
             period = past_hour.strftime("%Y-%m-%d %H:00:00Z")
         payload = {"time": period, "contents": "minimal", "area": "full"}
-        response = requests.request(
-            "POST",
+        response = self.session.post(
             f"{self.reports_url}traffic_snapshot",
-            headers=self.header,
-            data=str(payload),
+            json=payload,
             timeout=20,
         )
-        report = json2pandas(response.text, "features")
         response.raise_for_status()
+        report = json2pandas(response.content, "features")
         segments = [segment["segment_id"] for segment in report["properties"]]
         return segments
 
+    def get_cameras_catalog(self, refresh: bool = False):
+        """Get informations of all cameras, active or not, in one request
+
+        Args:
+            refresh (bool, optional): Query the API even if the response is in the HTTP cache.
+                Defaults to False.
+
+        Returns:
+            pd.DataFrame: information of all cameras
+        """
+        response = self.session.get(
+            self.cameras_url, timeout=20, force_refresh=refresh
+        )
+        response.raise_for_status()
+        return json2pandas(response.content, "cameras")
+
     def get_all_cameras(self):
         """Get id's of all cameras
 
         Returns:
             pd.DataFrame: list of all active cameras with their segment and version
         """
-        response = requests.request(
-            "GET", self.cameras_url, headers=self.header, timeout=20
-        )
-        response.raise_for_status()
-        report = json2pandas(response.text, "cameras")
-        cameras = report.query('status == "active"').filter(
-            ["instance_id", "segment_id", "hardware_version"]
-        )
-        time.sleep(5)
+        report = self.get_cameras_catalog()
+        cameras = report.loc[
+            report["status"].to_numpy() == "active",
+            ["instance_id", "segment_id", "hardware_version"],
+        ]
         return cameras.reset_index()
 
-    def get_cameras_by_segment(self, segment_id: int):
+    def get_cameras_by_segment(self, segment_id: int, refresh: bool = False):
         """Get all camera instances that are associated with the given segment_id
+        Responses are kept in memory, the API is queried once per segment.
 
         Args:
             segment_id (int): Telraam id of road segment
+            refresh (bool, optional): Query the API even if the segment is cached, in memory or in
+                the HTTP cache. Defaults to False.
 
         Returns:
             pd.DataFrame: information of all cameras of the segment
         """
+        if not refresh and segment_id in self._cameras_by_segment:
+            return self._cameras_by_segment[segment_id]
         url = f"{self.cameras_url}/segment/{segment_id}"
-        response = requests.request("GET", url, headers=self.header, timeout=10)
+        response = self.session.get(url, timeout=10, force_refresh=refresh)
         response.raise_for_status()
-        camera = json2pandas(response.text, "camera")
+        camera = json2pandas(response.content, "camera")
+        self._cameras_by_segment[segment_id] = camera
         return camera
 
     def get_active_cameras_by_segment(self, segment_id: int):
@@ -114,27 +406,59 @@ class SystemFetcher(APIFetcher):
         """
         cameras = self.get_cameras_by_segment(segment_id)
         if not isinstance(cameras, int):
-            active_cameras = cameras.query("status=='active'")
+            active_cameras = cameras[cameras["status"].to_numpy() == "active"]
+            records = active_cameras[
+                ["hardware_version", "instance_id", "time_added"]
+            ].itertuples(index=False, name=None)
             return {
                 f"v{version}": {"id": instance, "time_added": time_added}
-                for version, instance, time_added in zip(
-                    active_cameras["hardware_version"],
-                    active_cameras["instance_id"],
-                    active_cameras["time_added"],
-                )
+                for version, instance, time_added in records
             }
         return cameras
 
-    def create_sensors_file(self):
+    def create_sensors_file(self, yaml_copy: bool = True, refresh: bool = False):
         """Get cameras infos for segments specified in .env
-        Create a YAML files with major cameras informations.
+        Create a JSON file (config/sensors.json) with major cameras informations.
+        Cameras are taken from the catalog of all cameras, segments missing from it are
+        requested one by one.
+
+        Args:
+            yaml_copy (bool, optional): Also write them in config/sensors.yaml, for reading. Defaults to True.
+            refresh (bool, optional): Query the API even if cameras are cached. Defaults to False.
         """
-        sensors = pd.DataFrame()
-        for segment in tqdm(self.segments_id):
-            sensors_tmp = self.get_cameras_by_segment(segment)
-            sensors = pd.concat([sensors, sensors_tmp], ignore_index=True)
-        with open("config/sensors.yaml", "w", encoding="utf-8") as file:
-            yaml.dump(sensors.to_dict("index"), file, default_flow_style=False)
+        catalog = self.get_cameras_catalog(refresh=refresh)
+        frames = [catalog[catalog["segment_id"].isin(self.segments_id)]]
+        found_segments = set(frames[0]["segment_id"])
+        missing_segments = [
+            segment for segment in self.segments_id if segment not in found_segments
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            cameras = executor.map(
+                functools.partial(self.get_cameras_by_segment, refresh=refresh),
+                missing_segments,
+            )
+            frames += list(tqdm(cameras, total=len(missing_segments)))
+        frames = [sensors_tmp for sensors_tmp in frames if not sensors_tmp.empty]
+        if frames:
+            sensors = pd.concat(frames, ignore_index=True)
+            sensors = sensors.sort_values("segment_id", kind="stable", ignore_index=True)
+        else:
+            sensors = pd.DataFrame()
+        # Missing values (NaN, pd.NA) as null, json and yaml have no NaN
+        records = sensors.astype(object).where(sensors.notna(), None).to_dict("index")
+        if orjson is not None:
+            content = orjson.dumps(
+                records, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            )
+        else:
+            content = json.dumps(records, indent=2).encode("utf-8")
+        with open("config/sensors.json", "wb") as file:
+            file.write(content)
+        if yaml_copy:
+            # LibYAML emitter when PyYAML was built with it
+            dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+            with open("config/sensors.yaml", "w", encoding="utf-8") as file:
+                yaml.dump(records, file, Dumper=dumper, default_flow_style=False)
 
 
 class TrafficFetcher(APIFetcher):
@@ -145,6 +469,11 @@ class TrafficFetcher(APIFetcher):
         time_end (chr): end of the requested time interval - YYYY-MM-DD HH:MM:SSZ format
         level (chr, optional): 'instances' if traffic for a sensor. Defaults to 'segments'.
         telraam_format (chr, optional): Only per hour, per quarter soon. Defaults to 'per-hour'.
+        cache_dir (chr, optional): Directory of Parquet files caching past traffic, None to disable.
+            Defaults to 'cache/traffic'.
+        cache_margin (int, optional): Hours after time_end before its traffic is cached, as the
+            last hours are still completed by Telraam. Defaults to 6.
+        **kwargs: configuration overrides of APIFetcher (token, urls, ids, max_workers)
     """
 
     def __init__(
@@ -153,15 +482,112 @@ class TrafficFetcher(APIFetcher):
         time_end: chr,
         level: chr = "segments",
         telraam_format: chr = "per-hour",
+        cache_dir: chr = "cache/traffic",
+        cache_margin: int = 6,
+        **kwargs,
     ):
-        super().__init__()
+        super().__init__(**kwargs)
         self.time_start = time_start
         self.time_end = time_end
         self.level = level
         self.telraam_format = telraam_format
+        self.cache_dir = cache_dir
+        self.cache_margin = cache_margin
+        # Part of the traffic payload shared by every request of this fetcher
+        self._payload_base = {
+            "level": level,
+            "format": telraam_format,
+            "time_start": time_start,
+            "time_end": time_end,
+        }
+
+    def _cache_path(self, telraam_id):
+        """Get path of the Parquet file caching traffic of a sensor or a segment.
+        Only periods over for more than cache_margin hours are cached, their traffic will not
+        change anymore.
+
+        Args:
+            telraam_id (int): Telraam id of sensor or segment
+
+        Returns:
+            str: path of the cache file, None if traffic of this period must not be cached
+        """
+        if self.cache_dir is None:
+            return None
+        time_end = pd.Timestamp(self.time_end).tz_localize(None)
+        cache_limit = pd.Timestamp.now(tz="UTC").tz_localize(None) - timedelta(
+            hours=self.cache_margin
+        )
+        if time_end >= cache_limit:
+            return None
+        period = "_".join(
+            bound.replace(" ", "T").replace(":", "")
+            for bound in [self.time_start, self.time_end]
+        )
+        return os.path.join(
+            self.cache_dir,
+            self.level,
+            str(telraam_id),
+            f"{period}_{self.telraam_format}.parquet",
+        )
+
+    def _read_cache(self, telraam_id):
+        """Read traffic of a sensor or a segment from the Parquet cache.
+        List cells (e.g. speed histograms) are read back as lists, as in a fresh response.
+
+        Args:
+            telraam_id (int): Telraam id of sensor or segment
+
+        Returns:
+            pd.DataFrame: cached traffic informations, None if this traffic is not cached
+        """
+        cache_path = self._cache_path(telraam_id)
+        if cache_path is None or not os.path.isfile(cache_path):
+            return None
+        report = pd.read_parquet(cache_path, engine="pyarrow")
+        for column in report.columns[report.dtypes == object]:
+            values = report[column].dropna()
+            if not values.empty and isinstance(values.iloc[0], np.ndarray):
+                report[column] = report[column].map(
+                    np.ndarray.tolist, na_action="ignore"
+                )
+        return report
+
+    def _write_cache(self, cache_path, report):
+        """Write a traffic report in the Parquet cache.
+        The report is written to a temporary file then renamed, so an interrupted write
+        never leaves a truncated cache file.
+
+        Args:
+            cache_path (str): path of the cache file, from _cache_path (nothing is written if None)
+            report (pd.DataFrame): traffic informations to cache
+        """
+        if cache_path is not None and not report.empty:
+            cache_folder = os.path.dirname(cache_path)
+            os.makedirs(cache_folder, exist_ok=True)
+            file_descriptor, tmp_path = tempfile.mkstemp(dir=cache_folder, suffix=".tmp")
+            os.close(file_descriptor)
+            try:
+                report.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def _telraam_ids(self):
+        """Get ids of segments or sensors in config file, according to level.
+
+        Returns:
+            list: Telraam ids of segments (level = 'segments') or sensors (level = 'instances')
+        """
+        if self.level == "segments":
+            return self.segments_id
+        elif self.level == "instances":
+            return self.instances_id
 
     def get_traffic(self, telraam_id):
         """Get traffic informance for a sensor (instance) or a segment
+        Traffic of past periods is read from / written to the Parquet cache (see cache_dir).
 
         Args:
             telraam_id (int): Telraam id of sensor or segment
@@ -171,45 +597,230 @@ class TrafficFetcher(APIFetcher):
 
         #TODO : générer erreur si période de temps supérieure à 3 mois
         """
-        payload = {
-            "id": telraam_id,
-            "level": self.level,
-            "format": self.telraam_format,
-            "time_start": self.time_start,
-            "time_end": self.time_end,
-        }
-        response = requests.request(
-            "POST",
+        cached_report = self._read_cache(telraam_id)
+        if cached_report is not None:
+            return cached_report
+        cache_path = self._cache_path(telraam_id)
+        payload = {"id": telraam_id, **self._payload_base}
+        with self.session.post(
             f"{self.reports_url}traffic",
-            headers=self.header,
-            data=str(payload),
+            json=payload,
+            timeout=10,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            length = response.headers.get("Content-Length")
+            if ijson is not None and (
+                length is None or int(length) >= STREAMING_THRESHOLD
+            ):
+                response.raw.decode_content = True
+                report = stream2pandas(response.raw, "report")
+            else:
+                report = json2pandas(response.content, "report")
+        self._write_cache(cache_path, report)
+        return report
+
+    async def get_traffic_async(self, session, telraam_id, parse_executor=None):
+        """Coroutine version of get_traffic, sending the request with an aiohttp session.
+        Transient errors are retried with exponential backoff, honouring Retry-After, as in get_traffic.
+        A response is not requested again once its body is being read, and the Parquet cache is
+        read and written in a thread, out of the event loop.
+
+        Args:
+            session (aiohttp.ClientSession): session used to send the request
+            telraam_id (int): Telraam id of sensor or segment
+            parse_executor (concurrent.futures.Executor, optional): Executor parsing the response,
+                so the event loop keeps sending requests meanwhile. Defaults to None (parsed in the loop).
+
+        Returns:
+            pd.DataFrame : Traffic informations for this sensor/this segment during specified period
+        """
+        loop = asyncio.get_running_loop()
+        cached_report = await loop.run_in_executor(None, self._read_cache, telraam_id)
+        if cached_report is not None:
+            return cached_report
+        cache_path = self._cache_path(telraam_id)
+        payload = {"id": telraam_id, **self._payload_base}
+        for attempt in range(RETRY_TOTAL + 1):
+            delay = RETRY_BACKOFF_FACTOR * 2**attempt
+            await asyncio.sleep(self.rate_limiter.reserve())
+            try:
+                response = await session.post(
+                    f"{self.reports_url}traffic", json=payload
+                )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == RETRY_TOTAL:
+                    raise
+            else:
+                async with response:
+                    if response.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                        response.raise_for_status()
+                        # Errors while reading the body are raised, not retried
+                        content = await response.read()
+                        break
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = int(retry_after)
+            await asyncio.sleep(delay)
+        if parse_executor is None:
+            report = json2pandas(content, "report")
+        else:
+            report = await loop.run_in_executor(
+                parse_executor, json2pandas, content, "report"
+            )
+        await loop.run_in_executor(None, self._write_cache, cache_path, report)
+        return report
+
+    def get_traffic_batch(self, telraam_ids: list):
+        """Get traffic informations for several sensors (instances) or segments in one request.
+        Traffic of each id is written to the Parquet cache, as in get_traffic.
+
+        Args:
+            telraam_ids (list): Telraam ids of sensors or segments
+
+        Returns:
+            pd.DataFrame : Traffic informations for these sensors/segments during specified period,
+                None if the API refuses a list of ids (HTTP 400)
+        """
+        payload = {"ids": list(telraam_ids), **self._payload_base}
+        response = self.session.post(
+            f"{self.reports_url}traffic",
+            json=payload,
             timeout=10,
         )
+        if response.status_code == 400:
+            return None
         response.raise_for_status()
-        report = json2pandas(response.text, "report")
+        report = json2pandas(response.content, "report")
+        id_column = "segment_id" if self.level == "segments" else "instance_id"
+        if id_column in report.columns:
+            for telraam_id, report_id in report.groupby(id_column):
+                self._write_cache(
+                    self._cache_path(telraam_id), report_id.reset_index(drop=True)
+                )
         return report
 
-    def get_all_traffic(self, waiting_time: int = 10):
+    def get_all_traffic(
+        self, waiting_time: int = None, batch: bool = False, batch_size: int = 50
+    ):
         """Get traffic for given dates and all segments in config file.
         If level = 'instances' and the segment has multiple cameras, each camera will be included.
         Otherwise (level = 'segments', default), only the main camera will be included.
+        Requests are sent concurrently by a pool of MAX_WORKERS threads, within the
+        RATE_LIMIT_CALLS per RATE_LIMIT_PERIOD seconds shared by all fetchers (see .env).
 
         Args:
-            waiting_time (int, optional): Waiting time between two requests (in seconds). Defaults to 10.
+            waiting_time (int, optional): Minimal time between two requests (in seconds),
+                on top of the rate limit. Defaults to None.
+            batch (bool, optional): Ask traffic for batch_size ids per request, ids already in the
+                Parquet cache are read from it. If the API refuses the first batch, ids are
+                requested one by one. Defaults to False.
+            batch_size (int, optional): Number of ids per request if batch is True. Defaults to 50.
 
         Returns:
             pd.DataFrame: Traffic Data
         """
-        traffic = pd.DataFrame()
+        telraam_ids = self._telraam_ids()
+        rate_limiter = RateLimiter(calls=1, period=waiting_time or 0)
+
+        def get_limited_traffic(fetch, telraam_request):
+            rate_limiter.wait()
+            return fetch(telraam_request)
+
+        frames = []
+        fetch = self.get_traffic
+        requested = telraam_ids
+        if batch:
+            cached_reports = {
+                telraam_id: self._read_cache(telraam_id) for telraam_id in telraam_ids
+            }
+            frames = [report for report in cached_reports.values() if report is not None]
+            missing_ids = [
+                telraam_id
+                for telraam_id, report in cached_reports.items()
+                if report is None
+            ]
+            chunks = [
+                missing_ids[i : i + batch_size]
+                for i in range(0, len(missing_ids), batch_size)
+            ]
+            first_report = (
+                get_limited_traffic(self.get_traffic_batch, chunks[0]) if chunks else None
+            )
+            if first_report is None:
+                # No id left to fetch, or the API does not accept lists of ids
+                requested = missing_ids
+            else:
+                frames.append(first_report)
+                requested = chunks[1:]
+
+                def get_batch_traffic(chunk):
+                    report = self.get_traffic_batch(chunk)
+                    if report is None:  # refused after the first batch was accepted
+                        report = pd.concat(map(self.get_traffic, chunk), ignore_index=True)
+                    return report
+
+                fetch = get_batch_traffic
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            reports = executor.map(
+                lambda telraam_request: get_limited_traffic(fetch, telraam_request),
+                requested,
+            )
+            frames += list(tqdm(reports, total=len(requested)))
+        frames = [traffic_tmp for traffic_tmp in frames if not traffic_tmp.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    async def get_all_traffic_async(
+        self, waiting_time: int = None, parse_workers: int = None
+    ):
+        """Coroutine version of get_all_traffic: requests are sent from the asyncio event loop,
+        at most MAX_WORKERS at the same time, within the rate limit shared by all fetchers (see .env).
+        In a notebook, `await fetcher.get_all_traffic_async()`; elsewhere, wrap it in asyncio.run.
 
-        if self.level == "segments":
-            telraam_ids = self.segments_id
-        elif self.level == "instances":
-            telraam_ids = self.instances_id
-
-        for tmp_id in tqdm(telraam_ids):
-            traffic_tmp = self.get_traffic(tmp_id)
-            if not traffic_tmp.empty:
-                traffic = pd.concat([traffic, traffic_tmp], ignore_index=True)
-            time.sleep(waiting_time)
-        return traffic
\ No newline at end of file
+        Args:
+            waiting_time (int, optional): Minimal time between two requests (in seconds),
+                on top of the rate limit. Defaults to None.
+            parse_workers (int, optional): Number of processes parsing responses while the next
+                requests are sent, worth it for long periods. Defaults to None (parsed in the loop).
+
+        Returns:
+            pd.DataFrame: Traffic Data
+        """
+        telraam_ids = self._telraam_ids()
+        rate_limiter = RateLimiter(calls=1, period=waiting_time or 0)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        parse_executor = (
+            ProcessPoolExecutor(max_workers=parse_workers) if parse_workers else None
+        )
+
+        async def get_limited_traffic(session, telraam_id):
+            async with semaphore:
+                await asyncio.sleep(rate_limiter.reserve())
+                return await self.get_traffic_async(
+                    session, telraam_id, parse_executor
+                )
+
+        try:
+            async with aiohttp.ClientSession(
+                headers=self.header,
+                # As timeout=10 of requests: connection and gaps between reads, not the whole body
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10),
+                connector=aiohttp.TCPConnector(limit_per_host=self.max_workers),
+            ) as session:
+                reports = await tqdm_asyncio.gather(
+                    *[
+                        get_limited_traffic(session, telraam_id)
+                        for telraam_id in telraam_ids
+                    ]
+                )
+        finally:
+            if parse_executor is not None:
+                parse_executor.shutdown()
+        frames = [traffic_tmp for traffic_tmp in reports if not traffic_tmp.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)